@@ -10,7 +10,10 @@ Assumptions:
 - Username: admin
 - Password: 123456
 
-Keyboard controls (in the console window):
+Keyboard controls (in the console window).
+Hold a movement key to move the camera; releasing it stops the motion.
+Hold two keys together (e.g. W + D) to move diagonally.
+A quick tap nudges the camera for a short, fixed time.
   W / Up Arrow    - Tilt up
   S / Down Arrow  - Tilt down
   A / Left Arrow  - Pan left
@@ -28,160 +31,231 @@ Usage:
 """
 
 from __future__ import annotations
-import sys
+import ctypes
+import queue
+import threading
 import time
-from dataclasses import dataclass
+from ctypes import wintypes
 
 import msvcrt  # Windows-only keyboard input
 
-try:
-    from onvif import ONVIFCamera
-except ImportError as e:
-    print("Error: onvif package not installed or import failed.")
-    print("Try: pip install onvif_zeep or pip install onvif-zeep")
-    raise e
-
-
-@dataclass
-class CameraConfig:
-    ip: str = "192.168.1.13"
-    port: int = 80           # ONVIF/HTTP port
-    username: str = "admin"
-    password: str = "qazWSX((00"
-    wsdl_dir: str | None = None  # If set, points to WSDL directory
-
-
-class PTZController:
-    def __init__(self, config: CameraConfig):
-        self.config = config
-
-        # Create ONVIF camera object
-        # Only pass wsdl_dir if it's NOT None
-        if self.config.wsdl_dir:
-            self.camera = ONVIFCamera(
-                self.config.ip,
-                self.config.port,
-                self.config.username,
-                self.config.password,
-                wsdl_dir=self.config.wsdl_dir,
-            )
-        else:
-            self.camera = ONVIFCamera(
-                self.config.ip,
-                self.config.port,
-                self.config.username,
-                self.config.password,
-            )
-
-        # Create services
-        self.media = self.camera.create_media_service()
-        self.ptz = self.camera.create_ptz_service()
-
-        # Get profiles
-        profiles = self.media.GetProfiles()
-        if not profiles:
-            raise RuntimeError("No media profiles found on camera.")
-        self.profile = profiles[0]
-
-        # PTZ request objects
-        self.request_continuous = self.ptz.create_type("ContinuousMove")
-        self.request_continuous.ProfileToken = self.profile.token
-
-        self.request_stop = self.ptz.create_type("Stop")
-        self.request_stop.ProfileToken = self.profile.token
-
-        self.request_gotopreset = self.ptz.create_type("GotoPreset")
-        self.request_gotopreset.ProfileToken = self.profile.token
-
-        self.request_setpreset = self.ptz.create_type("SetPreset")
-        self.request_setpreset.ProfileToken = self.profile.token
-
-        # Try to read configuration options (limits, speeds)
-        try:
-            cfg = {"ConfigurationToken": self.profile.PTZConfiguration.token}
-            self.cfg_opts = self.ptz.GetConfigurationOptions(cfg)
-
-            if (
-                self.cfg_opts is not None
-                and hasattr(self.cfg_opts, "Spaces")
-                and self.cfg_opts.Spaces is not None
-                and hasattr(self.cfg_opts.Spaces, "PanTiltVelocitySpace")
-                and self.cfg_opts.Spaces.PanTiltVelocitySpace
-                and hasattr(self.cfg_opts.Spaces.PanTiltVelocitySpace[0], "XRange")
-                and hasattr(self.cfg_opts.Spaces.PanTiltVelocitySpace[0], "YRange")
-                and hasattr(self.cfg_opts.Spaces, "ZoomVelocitySpace")
-                and self.cfg_opts.Spaces.ZoomVelocitySpace
-                and hasattr(self.cfg_opts.Spaces.ZoomVelocitySpace[0], "XRange")
-            ):
-                self.max_pan_speed = self.cfg_opts.Spaces.PanTiltVelocitySpace[0].XRange.Max
-                self.max_tilt_speed = self.cfg_opts.Spaces.PanTiltVelocitySpace[0].YRange.Max
-                self.max_zoom_speed = self.cfg_opts.Spaces.ZoomVelocitySpace[0].XRange.Max
-            else:
-                self.max_pan_speed = 0.5
-                self.max_tilt_speed = 0.5
-                self.max_zoom_speed = 0.5
-        except Exception:
-            # fallback to defaults
-            self.max_pan_speed = 0.5
-            self.max_tilt_speed = 0.5
-            self.max_zoom_speed = 0.5
-
-    def _normalized_speed(self, v: float, max_speed: float) -> float:
-        """
-        Clamp v in [-1, 1] and scale by max_speed.
-        """
-        v = max(-1.0, min(1.0, v))
-        return v * max_speed
-
-    def continuous_move(self, pan: float, tilt: float, zoom: float) -> None:
-        """
-        Continuous move:
-        pan, tilt, zoom in range [-1, 1].
-
-        Positive pan = right, negative = left
-        Positive tilt = up, negative = down
-        Positive zoom = zoom in, negative = zoom out
-        """
-        self.request_continuous.Velocity = {
-            "PanTilt": {
-                "x": self._normalized_speed(pan, self.max_pan_speed),
-                "y": self._normalized_speed(tilt, self.max_tilt_speed),
-            },
-            "Zoom": {
-                "x": self._normalized_speed(zoom, self.max_zoom_speed),
-            },
-        }
-        self.ptz.ContinuousMove(self.request_continuous)
-
-    def stop(self, pan_tilt: bool = True, zoom: bool = True) -> None:
-        self.request_stop.PanTilt = pan_tilt
-        self.request_stop.Zoom = zoom
-        self.ptz.Stop(self.request_stop)
-
-    def go_to_preset(self, preset_token: str) -> None:
-        self.request_gotopreset.PresetToken = preset_token
-        self.ptz.GotoPreset(self.request_gotopreset)
-
-    def set_preset(self, name: str = "") -> str:
-        """
-        Save a preset at current position. Returns the preset token.
-        """
-        self.request_setpreset.PresetName = name
-        resp = self.ptz.SetPreset(self.request_setpreset)
-        if resp is not None and hasattr(resp, "PresetToken"):
-            return resp.PresetToken
-        else:
-            return ""
-
-    def list_presets(self):
-        """
-        Returns list of presets from the camera.
-        """
-        presets = self.ptz.GetPresets({"ProfileToken": self.profile.token})
-        return presets
+from ptz_core import CameraConfig, PTZController
+
+
+# Win32 console input wait and key state (hold-to-move)
+STD_INPUT_HANDLE = -10
+WAIT_OBJECT_0 = 0x00000000
+WAIT_FAILED = 0xFFFFFFFF
+INFINITE = 0xFFFFFFFF
+INPUT_WAIT_MS = 100  # bounded so Ctrl+C is still noticed
+HOLD_POLL_MS = 16    # ~60 Hz key-state sampling while a move is held
+KEY_DOWN = 0x8000
+
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+kernel32.GetStdHandle.argtypes = [wintypes.DWORD]
+kernel32.GetStdHandle.restype = wintypes.HANDLE
+kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+kernel32.WaitForSingleObject.restype = wintypes.DWORD
+kernel32.FlushConsoleInputBuffer.argtypes = [wintypes.HANDLE]
+kernel32.FlushConsoleInputBuffer.restype = wintypes.BOOL
+kernel32.GetNumberOfConsoleInputEvents.argtypes = [wintypes.HANDLE, wintypes.LPDWORD]
+kernel32.GetNumberOfConsoleInputEvents.restype = wintypes.BOOL
+kernel32.GetConsoleMode.argtypes = [wintypes.HANDLE, wintypes.LPDWORD]
+kernel32.GetConsoleMode.restype = wintypes.BOOL
+
+user32 = ctypes.WinDLL("user32", use_last_error=True)
+user32.GetAsyncKeyState.argtypes = [ctypes.c_int]
+user32.GetAsyncKeyState.restype = ctypes.c_short
+
+# Movement keys by virtual-key code -> (pan, tilt, zoom) contribution.
+# Held keys are summed per axis, so W + D moves diagonally.
+MOVE_VKEYS = (
+    (0x26, (0, 1, 0)),    # VK_UP
+    (0x28, (0, -1, 0)),   # VK_DOWN
+    (0x25, (-1, 0, 0)),   # VK_LEFT
+    (0x27, (1, 0, 0)),    # VK_RIGHT
+    (0x57, (0, 1, 0)),    # W
+    (0x53, (0, -1, 0)),   # S
+    (0x41, (-1, 0, 0)),   # A
+    (0x44, (1, 0, 0)),    # D
+    (0x51, (0, 0, 1)),    # Q, zoom in
+    (0x45, (0, 0, -1)),   # E, zoom out
+)
+NO_MOVE = (0, 0, 0)
+
+AXIS_LABELS = (
+    {-1: "Pan left", 1: "Pan right"},
+    {-1: "Tilt down", 1: "Tilt up"},
+    {-1: "Zoom out", 1: "Zoom in"},
+)
+
+
+def held_move() -> tuple[int, int, int]:
+    """
+    Returns the (pan, tilt, zoom) direction of the movement keys held down,
+    each -1, 0 or 1. Opposite keys cancel; NO_MOVE if nothing is held.
+    """
+    pan = tilt = zoom = 0
+    for vk, (dp, dt, dz) in MOVE_VKEYS:
+        if user32.GetAsyncKeyState(vk) & KEY_DOWN:
+            pan += dp
+            tilt += dt
+            zoom += dz
+    return (max(-1, min(1, pan)), max(-1, min(1, tilt)), max(-1, min(1, zoom)))
+
+
+def move_label(move: tuple[int, int, int]) -> str:
+    return " + ".join(labels[v] for labels, v in zip(AXIS_LABELS, move) if v)
+
+
+def read_pending_keys(h_stdin) -> list[bytes]:
+    """
+    Returns every key waiting in the console input buffer.
+    Special keys (arrows, numpad, F-keys) are returned as one two-byte item.
+    Raises OSError if the console can no longer be read.
+    """
+    keys = []
+    pending = wintypes.DWORD()
+    if not kernel32.GetNumberOfConsoleInputEvents(h_stdin, ctypes.byref(pending)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    if pending.value == 0:
+        return keys
+
+    if not msvcrt.kbhit():
+        # Only non-key records (key release, focus, mouse) are queued.
+        # Discard them, otherwise the handle stays signaled and we spin.
+        kernel32.FlushConsoleInputBuffer(h_stdin)
+        return keys
+
+    while msvcrt.kbhit():
+        ch = msvcrt.getch()
+        # Special keys start with b'\xe0' (arrows) or b'\x00' (numpad, F-keys)
+        if ch in (b"\x00", b"\xe0"):
+            ch += msvcrt.getch()
+        keys.append(ch)
+    return keys
+
+
+def console_reader(h_stdin, key_q: queue.Queue, reading: threading.Event) -> None:
+    """
+    Input thread: sleeps on the console handle and posts each key to key_q,
+    so keystrokes are captured while the main thread waits on the camera.
+
+    After posting a prompt key it stops reading until `reading` is set
+    again, leaving the typed text to input() on the main thread.
+    If the console can't be read it posts INPUT_LOST and exits.
+    """
+    try:
+        while True:
+            reading.wait()
+            result = kernel32.WaitForSingleObject(h_stdin, INFINITE)
+            if result == WAIT_FAILED:
+                raise ctypes.WinError(ctypes.get_last_error())
+            if result != WAIT_OBJECT_0:
+                continue
+            for ch in read_pending_keys(h_stdin):
+                if ch in PROMPT_KEYS:
+                    reading.clear()
+                key_q.put(ch)
+    except OSError as e:
+        print(f"\nConsole input failed: {e}")
+        key_q.put(INPUT_LOST)
+
+
+def is_console(handle) -> bool:
+    """
+    True if handle is a console input buffer (not a pipe or file).
+    """
+    mode = wintypes.DWORD()
+    return bool(kernel32.GetConsoleMode(handle, ctypes.byref(mode)))
+
+
+# Console key actions. Each takes the controller and returns True to quit.
+def _quit(controller: PTZController) -> bool:
+    print("ESC pressed. Exiting...")
+    return True
+
+
+def _stop(controller: PTZController) -> None:
+    print("Stop (SPACE)")
+    controller.stop_async()
+
+
+def _list_presets(controller: PTZController) -> None:
+    print("Listing presets...")
+    # Through the command thread, after any queued move or stop
+    presets = controller.list_presets_async().result()
+    if not presets:
+        print("  No presets found.")
+    else:
+        for p in presets:
+            print(f"  Token: {p.token}, Name: {getattr(p, 'Name', '')}")
+
+
+def _go_to_preset(controller: PTZController) -> None:
+    # Go to preset (prompt in console)
+    controller.stop_async().result()
+    token = input("\nEnter preset token to go to: ").strip()
+    if token:
+        print(f"Going to preset {token}...")
+        controller.go_to_preset(token)
+    else:
+        print("No token entered.")
+    print("Back to keyboard control...")
+
+
+def _save_preset(controller: PTZController) -> None:
+    controller.stop_async().result()
+    name = input("\nEnter name for new preset (optional): ").strip()
+    token = controller.set_preset(name=name)
+    print(f"Preset saved. Token: {token}")
+    print("Back to keyboard control...")
+
+
+def _input_lost(controller: PTZController) -> bool:
+    print("Keyboard input lost. Exiting...")
+    return True
+
+
+def _noop(controller: PTZController) -> None:
+    pass
+
+
+# Posted by console_reader when it can no longer read keys; getch() never
+# returns an empty byte string, so this can't collide with a real key.
+INPUT_LOST = b""
+
+
+# Raw key bytes -> action, with both cases listed so lookup needs no folding.
+# Movement keys are not listed: they are driven by real key state, so their
+# buffered presses and auto-repeats fall through to _noop.
+KEY_ACTIONS = {
+    b"\x1b": _quit,  # ESC
+    INPUT_LOST: _input_lost,
+    b" ": _stop,
+    b"p": _list_presets,
+    b"P": _list_presets,
+    b"g": _go_to_preset,
+    b"G": _go_to_preset,
+    b"o": _save_preset,
+    b"O": _save_preset,
+}
+
+# Keys whose action prompts with input(); the reader thread pauses after them
+PROMPT_KEYS = {b"g", b"G", b"o", b"O"}
+
+# Actions that stop the camera themselves; the hold logic starts over after them
+STOPPING_ACTIONS = {_stop, _go_to_preset, _save_preset}
 
 
 def run_keyboard():
+    h_stdin = kernel32.GetStdHandle(STD_INPUT_HANDLE)
+    if not is_console(h_stdin):
+        raise RuntimeError(
+            "Standard input is not a console. Run this from a console window "
+            "without redirecting input."
+        )
+
     config = CameraConfig()
     print(f"Connecting to camera at {config.ip}:{config.port} as {config.username}...")
     controller = PTZController(config)
@@ -202,125 +276,73 @@ def run_keyboard():
     print("ESC             - Quit")
     print()
     print("Make sure this console window is focused.")
-    print("Press keys to control the camera...")
-
-    move_speed = 1.0
-    move_duration_sec = .3  # duration of each movement burst
+    print("Hold movement keys to move the camera, release to stop.")
+    print("Hold two together (e.g. W + D) to move diagonally...")
+
+    # Keystrokes are captured on their own thread and handed over here
+    key_q = queue.Queue()
+    reading = threading.Event()
+    reading.set()
+    threading.Thread(
+        target=console_reader, args=(h_stdin, key_q, reading), daemon=True
+    ).start()
+
+    move_duration_sec = .3  # a quick tap still moves the camera this long
+    current = NO_MOVE  # (pan, tilt, zoom) currently driving the camera
+    stop_after = 0.0  # monotonic time before which a release doesn't stop yet
+    running = True
 
     try:
-        while True:
-            if msvcrt.kbhit():
-                ch = msvcrt.getch()
-
-                # Special keys (arrows) start with b'\xe0'
-                if ch == b"\xe0":
-                    ch2 = msvcrt.getch()
-                    # Arrow keys
-                    if ch2 == b"H":  # up
-                        print("Tilt up (↑)")
-                        controller.continuous_move(pan=0.0, tilt=move_speed, zoom=0.0)
-                        time.sleep(move_duration_sec)
-                        controller.stop()
-                    elif ch2 == b"P":  # down
-                        print("Tilt down (↓)")
-                        controller.continuous_move(pan=0.0, tilt=-move_speed, zoom=0.0)
-                        time.sleep(move_duration_sec)
-                        controller.stop()
-                    elif ch2 == b"K":  # left
-                        print("Pan left (←)")
-                        controller.continuous_move(pan=-move_speed, tilt=0.0, zoom=0.0)
-                        time.sleep(move_duration_sec)
-                        controller.stop()
-                    elif ch2 == b"M":  # right
-                        print("Pan right (→)")
-                        controller.continuous_move(pan=move_speed, tilt=0.0, zoom=0.0)
-                        time.sleep(move_duration_sec)
-                        controller.stop()
-                    continue
-
-                # Regular keys
-                key = ch.decode(errors="ignore").lower()
-
-                if ch == b"\x1b":  # ESC
-                    print("ESC pressed. Exiting...")
-                    controller.stop()
-                    break
-
-                elif key == "w":
-                    print("Tilt up (W)")
-                    controller.continuous_move(pan=0.0, tilt=move_speed, zoom=0.0)
-                    time.sleep(move_duration_sec)
-                    controller.stop()
-
-                elif key == "s":
-                    print("Tilt down (S)")
-                    controller.continuous_move(pan=0.0, tilt=-move_speed, zoom=0.0)
-                    time.sleep(move_duration_sec)
-                    controller.stop()
-
-                elif key == "a":
-                    print("Pan left (A)")
-                    controller.continuous_move(pan=-move_speed, tilt=0.0, zoom=0.0)
-                    time.sleep(move_duration_sec)
-                    controller.stop()
-
-                elif key == "d":
-                    print("Pan right (D)")
-                    controller.continuous_move(pan=move_speed, tilt=0.0, zoom=0.0)
-                    time.sleep(move_duration_sec)
-                    controller.stop()
-
-                elif key == "q":
-                    print("Zoom in (Q)")
-                    controller.continuous_move(pan=0.0, tilt=0.0, zoom=move_speed)
-                    time.sleep(move_duration_sec)
-                    controller.stop(zoom=True, pan_tilt=False)
-
-                elif key == "e":
-                    print("Zoom out (E)")
-                    controller.continuous_move(pan=0.0, tilt=0.0, zoom=-move_speed)
-                    time.sleep(move_duration_sec)
-                    controller.stop(zoom=True, pan_tilt=False)
-
-                elif ch == b" ":
-                    print("Stop (SPACE)")
-                    controller.stop()
-
-                elif key == "p":
-                    print("Listing presets...")
-                    presets = controller.list_presets()
-                    if not presets:
-                        print("  No presets found.")
-                    else:
-                        for p in presets:
-                            print(f"  Token: {p.token}, Name: {getattr(p, 'Name', '')}")
-
-                elif key == "g":
-                    # Go to preset (prompt in console)
-                    controller.stop()
-                    token = input("\nEnter preset token to go to: ").strip()
-                    if token:
-                        print(f"Going to preset {token}...")
-                        controller.go_to_preset(token)
+        while running:
+            # Idle: sleep until a key arrives (the timeout keeps Ctrl+C
+            # responsive). Moving: wake at ~60 Hz to notice the key release.
+            wait_ms = HOLD_POLL_MS if current != NO_MOVE else INPUT_WAIT_MS
+            try:
+                ch = key_q.get(timeout=wait_ms / 1000)
+            except queue.Empty:
+                ch = None
+            woke = ch is not None
+            stopped = False
+
+            while running and ch is not None:
+                action = KEY_ACTIONS.get(ch, _noop)
+                if action(controller):
+                    running = False
+                if action in STOPPING_ACTIONS:
+                    # The camera is already stopped: forget the current move
+                    # so a held key restarts it and a release sends nothing
+                    current = NO_MOVE
+                    stop_after = 0.0
+                    stopped = True
+                if ch in PROMPT_KEYS:
+                    # The prompt is done; let the reader thread resume
+                    reading.set()
+                try:
+                    ch = key_q.get_nowait()
+                except queue.Empty:
+                    ch = None
+
+            # Start, change or stop the move only when the held keys change
+            if running and not stopped and (woke or current != NO_MOVE):
+                held = held_move()
+                if held != current:
+                    if held == NO_MOVE:
+                        # A released tap keeps moving until stop_after; any
+                        # new key press cancels that and stops right away.
+                        if woke or time.monotonic() >= stop_after:
+                            controller.stop_async()
+                            current = held
                     else:
-                        print("No token entered.")
-                    print("Back to keyboard control...")
-
-                elif key == "o":
-                    # Save preset
-                    controller.stop()
-                    name = input("\nEnter name for new preset (optional): ").strip()
-                    token = controller.set_preset(name=name)
-                    print(f"Preset saved. Token: {token}")
-                    print("Back to keyboard control...")
-
-            # small sleep to avoid busy-waiting
-            time.sleep(0.01)
+                        print(move_label(held))
+                        controller.move_async(*held)
+                        if current == NO_MOVE:
+                            stop_after = time.monotonic() + move_duration_sec
+                        current = held
 
     except KeyboardInterrupt:
         print("\nKeyboardInterrupt. Stopping and exiting...")
     finally:
-        controller.stop()
+        controller.close()
 
 
 if __name__ == "__main__":
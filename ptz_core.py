@@ -0,0 +1,543 @@
+"""
+ptz_core.py
+
+ONVIF PTZ camera access shared by the CLI (ptz_controller.py) and the
+keyboard driver (ptz_control_with_keyboard.py).
+"""
+
+from __future__ import annotations
+import base64
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+try:
+    # for onvif_zeep / onvif-zeep
+    from lxml import etree
+    from onvif import ONVIFCamera, ONVIFError
+    from requests import RequestException, Session
+    from requests.adapters import HTTPAdapter
+    from zeep.cache import SqliteCache
+    from zeep.transports import Transport
+except ImportError as e:
+    print("Error: onvif package not installed or import failed.")
+    print("Try: pip install onvif_zeep or pip install onvif-zeep")
+    raise e
+
+
+@dataclass
+class CameraConfig:
+    ip: str = "192.168.1.13"
+    port: int = 80           # ONVIF/HTTP port
+    username: str = "admin"
+    password: str = "qazWSX((00"
+    wsdl_dir: str | None = None  # If None, onvif will use its built-in WSDLs
+    # Profile/speed cache, next to this module; None disables
+    cache_file: str | None = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "ptz_cache.json"
+    )
+
+
+# Cached profile token and speeds are trusted for this long before re-querying
+PROFILE_CACHE_MAX_AGE_SEC = 24 * 60 * 60
+
+
+def _cache_key(config: CameraConfig) -> str:
+    # Profiles can differ per user, so the user is part of the key
+    return f"{config.username}@{config.ip}:{config.port}"
+
+
+def _load_profile_cache(config: CameraConfig):
+    """
+    Returns (profile_token, max_pan, max_tilt, max_zoom) saved for this
+    camera, or None if there is no entry younger than PROFILE_CACHE_MAX_AGE_SEC.
+    """
+    if not config.cache_file:
+        return None
+    try:
+        with open(config.cache_file, encoding="utf-8") as f:
+            entry = json.load(f)[_cache_key(config)]
+        if time.time() - entry["saved_at"] > PROFILE_CACHE_MAX_AGE_SEC:
+            return None
+        return (
+            entry["profile_token"],
+            entry["max_pan_speed"],
+            entry["max_tilt_speed"],
+            entry["max_zoom_speed"],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_profile_cache(config: CameraConfig, profile_token: str, max_speeds) -> None:
+    """
+    Stores the profile token and max speeds for this camera in config.cache_file.
+    """
+    if not config.cache_file:
+        return
+    cache = _read_cache_file(config)
+    max_pan, max_tilt, max_zoom = max_speeds
+    cache[_cache_key(config)] = {
+        "profile_token": profile_token,
+        "max_pan_speed": max_pan,
+        "max_tilt_speed": max_tilt,
+        "max_zoom_speed": max_zoom,
+        "saved_at": time.time(),
+    }
+    _write_cache_file(config, cache)
+
+
+def _read_cache_file(config: CameraConfig) -> dict:
+    try:
+        with open(config.cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _write_cache_file(config: CameraConfig, cache: dict) -> None:
+    try:
+        with open(config.cache_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        # The cache is only a startup shortcut
+        pass
+
+
+def _read_max_speeds(cfg_opts) -> tuple[float, float, float]:
+    """
+    Returns (pan, tilt, zoom) max velocities from PTZ configuration options.
+    Any value the camera doesn't report falls back to 0.5.
+    """
+    try:
+        pan_tilt = cfg_opts.Spaces.PanTiltVelocitySpace[0]
+        max_pan, max_tilt = pan_tilt.XRange.Max, pan_tilt.YRange.Max
+    except (AttributeError, IndexError, TypeError):
+        max_pan, max_tilt = 0.5, 0.5
+    try:
+        max_zoom = cfg_opts.Spaces.ZoomVelocitySpace[0].XRange.Max
+    except (AttributeError, IndexError, TypeError):
+        max_zoom = 0.5
+    return max_pan, max_tilt, max_zoom
+
+
+# WS-Security UsernameToken namespaces, for the per-request header SoapTemplate builds
+WSSE_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd"
+WSU_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd"
+WSS_PROFILE_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0"
+WSS_MESSAGE_NS = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-soap-message-security-1.0"
+
+
+def _marker(name: str) -> str:
+    return f"__ptz_{name}__"
+
+
+class SoapTemplateUnavailable(Exception):
+    """
+    SoapTemplate can't be used with this library version or camera setup;
+    callers send the operation through zeep instead.
+    """
+
+
+class SoapTemplate:
+    """
+    A PTZ request serialized once by zeep, with str.format placeholders for
+    the values that change. send() fills in the values and a fresh
+    UsernameToken, then POSTs it on the shared session, skipping zeep's
+    per-call XML building.
+    """
+
+    def __init__(self, service, session, operation: str, fields: dict, **sample):
+        """
+        fields maps placeholder name -> (element local name, attribute or None);
+        sample gives valid values for every parameter of the operation.
+
+        Raises SoapTemplateUnavailable if the onvif/zeep versions installed
+        don't expose the internals used here, or for plain-text auth.
+        """
+        try:
+            create = service.ws_client._binding._create
+            zeep_client = service.zeep_client
+            encrypt = service.encrypt
+            address = service.xaddr
+            username = service.user
+            password = service.passwd
+            dt_diff = service.dt_diff
+        except AttributeError as e:
+            raise SoapTemplateUnavailable(f"unsupported onvif/zeep version ({e})") from e
+        if not encrypt:
+            raise SoapTemplateUnavailable("SoapTemplate only supports digest authentication.")
+
+        envelope, headers = create(operation, (), sample, client=zeep_client)
+
+        # Drop zeep's one-off UsernameToken; send() builds a new one per call
+        soap_ns = etree.QName(envelope).namespace
+        header = envelope.find(f"{{{soap_ns}}}Header")
+        if header is None:
+            header = etree.Element(f"{{{soap_ns}}}Header")
+            envelope.insert(0, header)
+        for child in list(header):
+            header.remove(child)
+        header.text = _marker("security")
+
+        for name, (element, attribute) in fields.items():
+            node = envelope.find(f".//{{*}}{element}")
+            if node is None:
+                raise LookupError(f"{operation} request has no {element} element")
+            if attribute is None:
+                node.text = _marker(name)
+            else:
+                node.set(attribute, _marker(name))
+
+        xml = etree.tostring(envelope, encoding="unicode")
+        xml = xml.replace("{", "{{").replace("}", "}}")
+        for name in ("security", *fields):
+            xml = xml.replace(_marker(name), "{%s}" % name)
+
+        self._template = xml
+        self._headers = dict(headers)
+        self._address = address
+        self._session = session
+        self._username = escape(username)
+        self._password = password.encode("utf-8")
+        self._dt_diff = dt_diff
+
+    def _security_header(self) -> str:
+        # Same digest as zeep: Base64(SHA-1(nonce + created + password))
+        nonce = os.urandom(16)
+        created = datetime.now(timezone.utc)
+        if self._dt_diff is not None:
+            created += self._dt_diff
+        created = created.replace(microsecond=0).isoformat()
+        digest = hashlib.sha1(nonce + created.encode("utf-8") + self._password).digest()
+        return (
+            f'<wsse:Security xmlns:wsse="{WSSE_NS}"><wsse:UsernameToken>'
+            f"<wsse:Username>{self._username}</wsse:Username>"
+            f'<wsse:Password Type="{WSS_PROFILE_NS}#PasswordDigest">'
+            f"{base64.b64encode(digest).decode()}</wsse:Password>"
+            f'<wsse:Nonce EncodingType="{WSS_MESSAGE_NS}#Base64Binary">'
+            f"{base64.b64encode(nonce).decode()}</wsse:Nonce>"
+            f'<wsu:Created xmlns:wsu="{WSU_NS}">{created}</wsu:Created>'
+            "</wsse:UsernameToken></wsse:Security>"
+        )
+
+    def send(self, **values: str) -> None:
+        """
+        POST the request with values (already XML-safe strings) filled in.
+        Raises ONVIFError on a SOAP fault or HTTP error, like the zeep path.
+        """
+        body = self._template.format(security=self._security_header(), **values)
+        try:
+            response = self._session.post(
+                self._address, data=body.encode("utf-8"), headers=self._headers
+            )
+        except RequestException as e:
+            raise ONVIFError(e) from e
+        if response.status_code >= 400:
+            raise ONVIFError(_fault_reason(response))
+
+
+def _fault_reason(response) -> str:
+    """
+    The SOAP fault text in an error response, or the HTTP status if none.
+    """
+    try:
+        root = etree.fromstring(response.content)
+        text = root.findtext(".//{*}Reason/{*}Text") or root.findtext(".//faultstring")
+        if text:
+            return text.strip()
+    except (etree.XMLSyntaxError, ValueError):
+        pass
+    return f"HTTP {response.status_code} {response.reason}"
+
+
+def _move_fields(velocity: dict) -> dict:
+    """
+    ContinuousMove template fields for a Velocity dict.
+    """
+    return {
+        "pan": repr(float(velocity["PanTilt"]["x"])),
+        "tilt": repr(float(velocity["PanTilt"]["y"])),
+        "zoom": repr(float(velocity["Zoom"]["x"])),
+    }
+
+
+def _report_failure(future: Future) -> None:
+    if future.exception() is not None:
+        print(f"PTZ command failed: {future.exception()}")
+
+
+class PTZController:
+    def __init__(self, config: CameraConfig):
+        self.config = config
+
+        # One keep-alive HTTP session shared by every ONVIF service call
+        self._session = Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Keep zeep's on-disk WSDL cache, which onvif only adds when it builds
+        # the transport itself
+        transport = Transport(session=self._session, cache=SqliteCache())
+
+        # Create ONVIF camera object
+        # Only pass wsdl_dir if it's NOT None
+        if self.config.wsdl_dir:
+            self.camera = ONVIFCamera(
+                self.config.ip,
+                self.config.port,
+                self.config.username,
+                self.config.password,
+                wsdl_dir=self.config.wsdl_dir,
+                transport=transport,
+            )
+        else:
+            self.camera = ONVIFCamera(
+                self.config.ip,
+                self.config.port,
+                self.config.username,
+                self.config.password,
+                transport=transport,
+            )
+
+        # Create services
+        self.ptz = self.camera.create_ptz_service()
+
+        # Look up the PTZ operations once; each attribute access on the
+        # service otherwise resolves the operation and builds a new wrapper
+        self._op_continuous_move = self.ptz.ContinuousMove
+        self._op_stop = self.ptz.Stop
+        self._op_goto_preset = self.ptz.GotoPreset
+        self._op_set_preset = self.ptz.SetPreset
+        self._op_get_presets = self.ptz.GetPresets
+
+        cached = _load_profile_cache(self.config)
+        if cached is not None and not self._profile_token_valid(cached[0]):
+            # Camera reset or profiles changed: look the profile up again
+            print("Cached PTZ profile is no longer valid; re-reading profiles.")
+            cached = None
+        if cached is not None:
+            # Fresh cache: skip the Media service and the capability queries
+            self.profile = None
+            self.cfg_opts = None
+            (
+                self.profile_token,
+                self.max_pan_speed,
+                self.max_tilt_speed,
+                self.max_zoom_speed,
+            ) = cached
+        else:
+            # Media is only needed to find the profile
+            media = self.camera.create_media_service()
+
+            # Get profiles
+            profiles = media.GetProfiles()
+            if not profiles:
+                raise RuntimeError("No media profiles found on camera.")
+            self.profile = profiles[0]
+            self.profile_token = self.profile.token
+
+            # Try to read configuration options (limits, speeds)
+            try:
+                request_cfg_opts = self.ptz.create_type("GetConfigurationOptions")
+                request_cfg_opts.ConfigurationToken = self.profile.PTZConfiguration.token
+                self.cfg_opts = self.ptz.GetConfigurationOptions(request_cfg_opts)
+            except Exception:
+                # fallback to defaults
+                self.cfg_opts = None
+            self.max_pan_speed, self.max_tilt_speed, self.max_zoom_speed = _read_max_speeds(
+                self.cfg_opts
+            )
+            if self.cfg_opts is not None:
+                # Don't pin fallback speeds in the cache
+                _save_profile_cache(
+                    self.config,
+                    self.profile_token,
+                    (self.max_pan_speed, self.max_tilt_speed, self.max_zoom_speed),
+                )
+
+        # PTZ request objects
+        self.request_continuous = self.ptz.create_type("ContinuousMove")
+        self.request_continuous.ProfileToken = self.profile_token
+        # Velocity for off-grid speeds; continuous_move only updates the numbers
+        self._velocity = {"PanTilt": {"x": 0.0, "y": 0.0}, "Zoom": {"x": 0.0}}
+        self._pan_tilt_velocity = self._velocity["PanTilt"]
+        self._zoom_velocity = self._velocity["Zoom"]
+        self.request_continuous.Velocity = self._velocity
+
+        self.request_stop = self.ptz.create_type("Stop")
+        self.request_stop.ProfileToken = self.profile_token
+
+        self.request_gotopreset = self.ptz.create_type("GotoPreset")
+        self.request_gotopreset.ProfileToken = self.profile_token
+
+        self.request_setpreset = self.ptz.create_type("SetPreset")
+        self.request_setpreset.ProfileToken = self.profile_token
+
+        self.request_getpresets = self.ptz.create_type("GetPresets")
+        self.request_getpresets.ProfileToken = self.profile_token
+
+        # Pre-serialized SOAP for the frequent PTZ calls. If the installed onvif
+        # library doesn't expose what the templates need, use zeep as before;
+        # any other error here is a bug and is left to propagate.
+        try:
+            self._tpl_continuous_move = SoapTemplate(
+                self.ptz, self._session, "ContinuousMove",
+                {"pan": ("PanTilt", "x"), "tilt": ("PanTilt", "y"), "zoom": ("Zoom", "x")},
+                ProfileToken=self.profile_token, Velocity=self._velocity,
+            )
+            self._tpl_stop = SoapTemplate(
+                self.ptz, self._session, "Stop",
+                {"pan_tilt": ("PanTilt", None), "zoom": ("Zoom", None)},
+                ProfileToken=self.profile_token, PanTilt=True, Zoom=True,
+            )
+            self._tpl_goto_preset = SoapTemplate(
+                self.ptz, self._session, "GotoPreset",
+                {"preset_token": ("PresetToken", None)},
+                ProfileToken=self.profile_token, PresetToken="0",
+            )
+        except SoapTemplateUnavailable as e:
+            print(f"Note: sending PTZ commands through zeep: {e}")
+            self._tpl_continuous_move = None
+            self._tpl_stop = None
+            self._tpl_goto_preset = None
+
+        # Single worker so queued commands reach the camera in order
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        # Full-speed moves for every (pan, tilt, zoom) sign combination: the
+        # Velocity for zeep plus the template fields, already formatted
+        mp, mt, mz = self.max_pan_speed, self.max_tilt_speed, self.max_zoom_speed
+        self._move_cache = {}
+        for pan in (-1, 0, 1):
+            for tilt in (-1, 0, 1):
+                for zoom in (-1, 0, 1):
+                    velocity = {
+                        "PanTilt": {"x": pan * mp, "y": tilt * mt},
+                        "Zoom": {"x": zoom * mz},
+                    }
+                    self._move_cache[(pan, tilt, zoom)] = (velocity, _move_fields(velocity))
+
+    def _profile_token_valid(self, profile_token: str) -> bool:
+        """
+        One cheap PTZ call to check a cached profile token is still known.
+        """
+        try:
+            self.ptz.GetStatus({"ProfileToken": profile_token})
+            return True
+        except ONVIFError:
+            return False
+
+    def _normalized_speed(self, v: float, max_speed: float) -> float:
+        """
+        Clamp v in [-1, 1] and scale by max_speed.
+        """
+        v = max(-1.0, min(1.0, v))
+        return v * max_speed
+
+    def continuous_move(self, pan: float, tilt: float, zoom: float) -> None:
+        """
+        Continuous move:
+        pan, tilt, zoom in range [-1, 1].
+
+        Positive pan = right, negative = left
+        Positive tilt = up, negative = down
+        Positive zoom = zoom in, negative = zoom out
+        """
+        cached = self._move_cache.get((pan, tilt, zoom))
+        if cached is not None:
+            self._send_move(*cached)
+            return
+        self._pan_tilt_velocity["x"] = self._normalized_speed(pan, self.max_pan_speed)
+        self._pan_tilt_velocity["y"] = self._normalized_speed(tilt, self.max_tilt_speed)
+        self._zoom_velocity["x"] = self._normalized_speed(zoom, self.max_zoom_speed)
+        self._send_move(self._velocity, _move_fields(self._velocity))
+
+    def move(self, pan: int, tilt: int, zoom: int) -> None:
+        """
+        Continuous move at full speed; pan, tilt and zoom are each -1, 0 or 1.
+        """
+        self._send_move(*self._move_cache[(pan, tilt, zoom)])
+
+    def _send_move(self, velocity: dict, fields: dict) -> None:
+        if self._tpl_continuous_move is not None:
+            self._tpl_continuous_move.send(**fields)
+        else:
+            self.request_continuous.Velocity = velocity
+            self._op_continuous_move(self.request_continuous)
+
+    def stop(self, pan_tilt: bool = True, zoom: bool = True) -> None:
+        if self._tpl_stop is not None:
+            self._tpl_stop.send(
+                pan_tilt="true" if pan_tilt else "false",
+                zoom="true" if zoom else "false",
+            )
+            return
+        self.request_stop.PanTilt = pan_tilt
+        self.request_stop.Zoom = zoom
+        self._op_stop(self.request_stop)
+
+    def _submit(self, fn, *args) -> Future:
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(_report_failure)
+        return future
+
+    def move_async(self, pan: int, tilt: int, zoom: int) -> Future:
+        """
+        Queue move on the command thread and return immediately.
+        """
+        return self._submit(self.move, pan, tilt, zoom)
+
+    def stop_async(self, pan_tilt: bool = True, zoom: bool = True) -> Future:
+        """
+        Queue a Stop on the command thread and return immediately.
+        It is sent after any move queued before it.
+        """
+        return self._submit(self.stop, pan_tilt, zoom)
+
+    def list_presets_async(self) -> Future:
+        """
+        Queue list_presets on the command thread; the Future holds the presets.
+        """
+        return self._submit(self.list_presets)
+
+    def close(self) -> None:
+        """
+        Wait for queued commands, then stop all motion.
+        """
+        self._executor.shutdown(wait=True)
+        self.stop()
+
+    def go_to_preset(self, preset_token: str) -> None:
+        if self._tpl_goto_preset is not None:
+            self._tpl_goto_preset.send(preset_token=escape(preset_token))
+            return
+        self.request_gotopreset.PresetToken = preset_token
+        self._op_goto_preset(self.request_gotopreset)
+
+    def set_preset(self, name: str = "") -> str:
+        """
+        Save a preset at current position. Returns the preset token.
+        """
+        self.request_setpreset.PresetName = name
+        resp = self._op_set_preset(self.request_setpreset)
+        if resp is not None and hasattr(resp, "PresetToken"):
+            return resp.PresetToken
+        else:
+            print("Warning: No PresetToken returned from camera.")
+            return ""
+
+    def list_presets(self):
+        """
+        Returns list of presets from the camera.
+        """
+        presets = self._op_get_presets(self.request_getpresets)
+        return presets